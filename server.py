@@ -4,6 +4,7 @@ Simple Alpaca MCP Server using FastMCP
 
 Tools exposed:
 - get_quote
+- get_quotes
 - get_account
 - get_positions
 - place_order
@@ -14,12 +15,18 @@ Works with both paper and live trading depending on ALPACA_BASE_URL.
 """
 
 import os
-import json
+import asyncio
+import functools
 import logging
-from typing import List, Optional
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import asynccontextmanager
+from dataclasses import dataclass
+from typing import AsyncIterator, List, Optional
 
 import alpaca_trade_api as tradeapi
-import requests  # NEW: for sending analytics to your app
+import httpx
+import orjson
+from cachetools import TTLCache
 
 from fastmcp import FastMCP
 
@@ -55,27 +62,80 @@ ALPACA_BASE_URL = (
     or "https://paper-api.alpaca.markets"
 )
 
+# Market data lives on a separate host from trading (same for paper and live)
+ALPACA_DATA_URL = (
+    os.getenv("ALPACA_DATA_URL")
+    or os.getenv("APCA_API_DATA_URL")
+    or "https://data.alpaca.markets"
+).rstrip("/")
+
 MAX_POSITION_SIZE = int(os.getenv("MAX_POSITION_SIZE", "1000"))
 MAX_POSITION_VALUE = float(os.getenv("MAX_POSITION_VALUE", "10000"))
 ALLOWED_SYMBOLS_FILE = os.getenv("ALLOWED_SYMBOLS_FILE", "data/universe_liquid.txt")
 
+# Retry policy for data API calls; same variables and defaults the SDK used
+APCA_RETRY_MAX = int(os.getenv("APCA_RETRY_MAX", "3"))
+APCA_RETRY_WAIT = int(os.getenv("APCA_RETRY_WAIT", "3"))
+APCA_RETRY_CODES = frozenset(
+    int(c) for c in os.getenv("APCA_RETRY_CODES", "429,504").split(",")
+)
+
+# Number of uvicorn worker processes for the HTTP transport. Multi-worker
+# is opt-in: workers can't invalidate each other's caches, so with >1 the
+# account/positions cache is turned off (see ACCOUNT_CACHE_TTL below).
+WEB_CONCURRENCY = int(os.getenv("WEB_CONCURRENCY", "1"))
+
+# Seconds to reuse Alpaca reads before refetching
+SNAPSHOT_CACHE_TTL = float(os.getenv("SNAPSHOT_CACHE_TTL", "2"))
+ACCOUNT_CACHE_TTL = float(os.getenv("ACCOUNT_CACHE_TTL", "5"))
+if WEB_CONCURRENCY > 1:
+    # A write on one worker would leave other workers serving pre-order
+    # account/positions until the TTL ran out.
+    ACCOUNT_CACHE_TTL = 0.0
+
 # NEW: Analytics config for your IW Positions app
 ANALYTICS_ENDPOINT = os.getenv("ANALYTICS_ENDPOINT")  # e.g. https://iw-positions-app.vercel.app/api/analytics
 ANALYTICS_TOKEN = os.getenv("ANALYTICS_TOKEN")        # should match APP_TOKEN in the app
 
 logger.info("=== Alpaca MCP Server config ===")
 logger.info(f"ALPACA_BASE_URL: {ALPACA_BASE_URL}")
+logger.info(f"ALPACA_DATA_URL: {ALPACA_DATA_URL}")
 logger.info(f"ALPACA key present: {bool(ALPACA_KEY)}")
 logger.info(f"ALPACA secret present: {bool(ALPACA_SECRET)}")
 logger.info(f"ANALYTICS_ENDPOINT set: {bool(ANALYTICS_ENDPOINT)}")
+logger.info(f"WEB_CONCURRENCY: {WEB_CONCURRENCY}")
+logger.info(f"ACCOUNT_CACHE_TTL: {ACCOUNT_CACHE_TTL}")
 logger.info("================================")
 
 
+# ---------------------------------------------------------------------------
+# JSON
+# ---------------------------------------------------------------------------
+
+
+def _dumps(data) -> str:
+    """
+    Pretty JSON for human-facing tool responses (orjson is much faster than
+    stdlib). Machine-consumed output (analytics POST, get_positions) is
+    encoded compact instead.
+    """
+    return orjson.dumps(data, option=orjson.OPT_INDENT_2).decode()
+
+
 # ---------------------------------------------------------------------------
 # Analytics helper
 # ---------------------------------------------------------------------------
 
-def send_analytics(event_type: str, data: dict, chart_base64: Optional[str] = None) -> None:
+# One pooled client so analytics posts reuse the same keep-alive connection.
+_http = httpx.AsyncClient(timeout=5.0, headers={"Content-Type": "application/json"})
+
+# Strong refs to in-flight fire-and-forget sends so they aren't GC'd early.
+_background_tasks: set = set()
+
+
+async def send_analytics(
+    event_type: str, data: dict, chart_base64: Optional[str] = None
+) -> None:
     """
     Send analytics payload to the IW Positions app.
 
@@ -96,18 +156,16 @@ def send_analytics(event_type: str, data: dict, chart_base64: Optional[str] = No
         "chart_data": chart_base64,
     }
 
-    headers = {"Content-Type": "application/json"}
+    headers = {}
     if ANALYTICS_TOKEN:
         headers["x-app-token"] = ANALYTICS_TOKEN
 
     try:
-        resp = requests.post(
-            ANALYTICS_ENDPOINT,
-            json=payload,
-            headers=headers,
-            timeout=5,
+        # Compact, not indented: only the app reads this body.
+        resp = await _http.post(
+            ANALYTICS_ENDPOINT, content=orjson.dumps(payload), headers=headers
         )
-        if resp.ok:
+        if resp.is_success:
             logger.info("Analytics event '%s' sent successfully", event_type)
         else:
             logger.warning(
@@ -119,12 +177,23 @@ def send_analytics(event_type: str, data: dict, chart_base64: Optional[str] = No
         logger.warning("Analytics send error: %s", e)
 
 
+def send_analytics_in_background(
+    event_type: str, data: dict, chart_base64: Optional[str] = None
+) -> None:
+    """Schedule send_analytics without making the caller wait on the POST."""
+    task = asyncio.create_task(send_analytics(event_type, data, chart_base64))
+    _background_tasks.add(task)
+    task.add_done_callback(_background_tasks.discard)
+
+
 # ---------------------------------------------------------------------------
 # Clients
 # ---------------------------------------------------------------------------
 
 alpaca: tradeapi.REST
 
+# Constructing the client is local only; the auth check against Alpaca runs
+# in the background once the server is serving (see _probe_auth).
 try:
     alpaca = tradeapi.REST(
         key_id=ALPACA_KEY,
@@ -132,46 +201,244 @@ try:
         base_url=ALPACA_BASE_URL,
         api_version="v2",
     )
-    acct = alpaca.get_account()
-    logger.info(
-        "Alpaca auth OK at startup: status=%s equity=%s buying_power=%s",
-        acct.status,
-        acct.equity,
-        acct.buying_power,
-    )
 except Exception as e:
-    logger.error("Alpaca auth FAILED at startup: %s", e)
+    logger.error("Alpaca client setup FAILED: %s", e)
+
+# Market data goes straight to the data API over one persistent HTTP/2
+# connection, so concurrent quote lookups share a TLS session instead of the
+# SDK's per-call requests round-trips.
+_alpaca_http = httpx.AsyncClient(
+    http2=True,
+    timeout=5.0,
+    headers={
+        "APCA-API-KEY-ID": ALPACA_KEY or "",
+        "APCA-API-SECRET-KEY": ALPACA_SECRET or "",
+    },
+)
+
+# alpaca_trade_api.REST is blocking, so its calls run on a dedicated bounded
+# pool: threads are reused across requests and at most 8 Alpaca calls are in
+# flight at once.
+_EXEC = ThreadPoolExecutor(max_workers=8, thread_name_prefix="alpaca")
+
+
+async def _run(fn, *args, **kwargs):
+    """Run a blocking Alpaca call on _EXEC without blocking the event loop."""
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(_EXEC, functools.partial(fn, *args, **kwargs))
+
 
 # ---------------------------------------------------------------------------
 # Allowed symbols (optional universe file)
 # ---------------------------------------------------------------------------
 
 
-def load_allowed_symbols() -> set:
+@functools.lru_cache(maxsize=None)
+def load_allowed_symbols() -> frozenset:
+    """
+    Load the universe on first use rather than at import, so the uvicorn
+    supervisor never reads it and each worker pays for it only once.
+    """
+    # One bulk read + splitlines is cheaper than iterating the file per line.
     try:
-        with open(ALLOWED_SYMBOLS_FILE, "r") as f:
-            return {line.strip().upper() for line in f if line.strip()}
+        with open(ALLOWED_SYMBOLS_FILE, "rb") as f:
+            data = f.read()
     except FileNotFoundError:
         logger.info(
             "No universe file %s found; all symbols will be allowed.", ALLOWED_SYMBOLS_FILE
         )
-        return set()
+        return frozenset()
+    return frozenset(
+        line.strip().upper() for line in data.decode().splitlines() if line.strip()
+    )
 
 
-ALLOWED_SYMBOLS = load_allowed_symbols()
+def validate_symbol(symbol: str) -> bool:
+    # Callers pass an already-uppercased symbol (tools normalize on entry).
+    allowed = load_allowed_symbols()
+    return not allowed or symbol in allowed
 
 
-def validate_symbol(symbol: str) -> bool:
-    if not ALLOWED_SYMBOLS:
-        return True
-    return symbol.upper() in ALLOWED_SYMBOLS
+# ---------------------------------------------------------------------------
+# Cached reads
+#
+# Chat clients tend to re-ask the same questions in bursts, so reads are
+# served from short-lived in-process caches. Writes (orders, closes) purge
+# whatever they can affect.
+# ---------------------------------------------------------------------------
+
+_snapshot_cache: TTLCache = TTLCache(maxsize=512, ttl=SNAPSHOT_CACHE_TTL)
+_account_cache: TTLCache = TTLCache(maxsize=8, ttl=ACCOUNT_CACHE_TTL)
+
+_MISSING = object()
+
+# Fetches currently running, by cache key. Concurrent misses on the same key
+# await one shared task instead of each calling Alpaca.
+_inflight: dict = {}
+
+# Caps in-flight snapshot requests so batch lookups stay inside Alpaca's
+# rate limits.
+_SNAPSHOT_SEMAPHORE = asyncio.Semaphore(10)
+
+
+async def _cached(cache: TTLCache, key: tuple, fetch):
+    value = cache.get(key, _MISSING)
+    if value is not _MISSING:
+        return value
+    task = _inflight.get(key)
+    if task is None:
+        task = asyncio.ensure_future(fetch())
+        _inflight[key] = task
+        task.add_done_callback(functools.partial(_store_fetched, cache, key))
+    # shield: one caller giving up must not cancel the fetch for the others.
+    return await asyncio.shield(task)
+
+
+def _store_fetched(cache: TTLCache, key: tuple, task: asyncio.Future) -> None:
+    # Skip if a write invalidated the key while this fetch was running; a
+    # failed fetch is simply dropped so the next caller retries.
+    if _inflight.get(key) is not task:
+        return
+    del _inflight[key]
+    # ttl <= 0 means caching is off for this cache; only single-flight applies.
+    if not task.cancelled() and task.exception() is None and cache.ttl > 0:
+        cache[key] = task.result()
+
+
+def _invalidate_after_write(symbol: str) -> None:
+    """Drop cached state that an order or close on `symbol` may have changed."""
+    for cache, key in (
+        (_account_cache, ("account",)),
+        (_account_cache, ("positions",)),
+        (_snapshot_cache, ("snapshot", symbol)),
+    ):
+        cache.pop(key, None)
+        _inflight.pop(key, None)
+
+
+async def _get_account():
+    return await _cached(_account_cache, ("account",), lambda: _run(alpaca.get_account))
+
+
+async def _list_positions():
+    return await _cached(
+        _account_cache, ("positions",), lambda: _run(alpaca.list_positions)
+    )
+
+
+def _retry_wait(resp: httpx.Response) -> float:
+    try:
+        return max(0.0, float(resp.headers["Retry-After"]))
+    except (KeyError, ValueError):
+        return float(APCA_RETRY_WAIT)
+
+
+async def _fetch_latest_price(symbol: str) -> Optional[float]:
+    url = f"{ALPACA_DATA_URL}/v2/stocks/{symbol}/snapshot"
+    # Bounded retry on rate limit / gateway timeout, as the SDK's REST client
+    # does; the wait happens outside the semaphore so it doesn't hold a slot.
+    retries = max(APCA_RETRY_MAX, 0)
+    while True:
+        async with _SNAPSHOT_SEMAPHORE:
+            resp = await _alpaca_http.get(url)
+        if resp.status_code not in APCA_RETRY_CODES or retries <= 0:
+            break
+        wait = _retry_wait(resp)
+        logger.warning(
+            "Snapshot %s got %s; retrying in %.1fs (%d left)",
+            symbol,
+            resp.status_code,
+            wait,
+            retries,
+        )
+        await asyncio.sleep(wait)
+        retries -= 1
+    resp.raise_for_status()
+    trade = orjson.loads(resp.content).get("latestTrade")
+    return float(trade["p"]) if trade else None
+
+
+async def _latest_price(symbol: str) -> Optional[float]:
+    return await _cached(
+        _snapshot_cache, ("snapshot", symbol), lambda: _fetch_latest_price(symbol)
+    )
+
+
+async def _snapshots(symbols: List[str]) -> List[tuple]:
+    """
+    Fetch latest prices for many symbols concurrently as (symbol, price).
+
+    A symbol whose lookup fails gets price None, so one bad ticker doesn't
+    hide the rest of the batch.
+    """
+    prices = await asyncio.gather(
+        *[_latest_price(s) for s in symbols], return_exceptions=True
+    )
+    results = []
+    for symbol, price in zip(symbols, prices):
+        if isinstance(price, Exception):
+            logger.warning("Quote lookup failed for %s: %s", symbol, price)
+            price = None
+        elif isinstance(price, BaseException):
+            raise price
+        results.append((symbol, price))
+    return results
+
+
+# ---------------------------------------------------------------------------
+# Portfolio rows
+# ---------------------------------------------------------------------------
+
+
+@dataclass(slots=True)
+class Pos:
+    """Per-position figures used by analyze_portfolio (plpc in percent)."""
+
+    symbol: str
+    market_value: float
+    unrealized_pl: float
+    unrealized_plpc: float
+
+
+# ---------------------------------------------------------------------------
+# Startup auth probe
+# ---------------------------------------------------------------------------
+
+_auth_probe: Optional[asyncio.Task] = None
+
+
+async def _probe_auth() -> None:
+    try:
+        acct = await _get_account()
+        logger.info(
+            "Alpaca auth OK: status=%s equity=%s buying_power=%s",
+            acct.status,
+            acct.equity,
+            acct.buying_power,
+        )
+    except Exception as e:
+        logger.error("Alpaca auth FAILED: %s", e)
+
+
+@asynccontextmanager
+async def lifespan(server: FastMCP) -> AsyncIterator[dict]:
+    """
+    Kick off the auth probe once per process without blocking startup.
+
+    FastMCP enters this per MCP session (per request when stateless), so the
+    probe is guarded to run only the first time.
+    """
+    global _auth_probe
+    if _auth_probe is None:
+        _auth_probe = asyncio.create_task(_probe_auth())
+    yield {}
 
 
 # ---------------------------------------------------------------------------
 # FastMCP server
 # ---------------------------------------------------------------------------
 
-mcp = FastMCP("alpaca-mcp-service")
+mcp = FastMCP("alpaca-mcp-service", lifespan=lifespan)
 
 # ---------------------------------------------------------------------------
 # Tools
@@ -182,29 +449,34 @@ mcp = FastMCP("alpaca-mcp-service")
 async def get_quote(symbol: str) -> str:
     symbol = symbol.upper()
     try:
-        snap = alpaca.get_snapshot(symbol)
-        price = (
-            float(snap.latest_trade.p)
-            if getattr(snap, "latest_trade", None) is not None
-            else None
-        )
+        price = await _latest_price(symbol)
         data = {"symbol": symbol, "price": price}
-        return json.dumps(data, indent=2)
+        return _dumps(data)
     except Exception as e:
         return f"Error getting quote: {e}"
 
 
+@mcp.tool(description="Get real-time quotes for several symbols from Alpaca.")
+async def get_quotes(symbols: List[str]) -> str:
+    symbols = [s.upper() for s in symbols]
+    try:
+        results = await _snapshots(symbols)
+        return _dumps(dict(results))
+    except Exception as e:
+        return f"Error getting quotes: {e}"
+
+
 @mcp.tool(description="Get Alpaca account information.")
 async def get_account() -> str:
     try:
-        acct = alpaca.get_account()
+        acct = await _get_account()
         data = {
             "status": acct.status,
             "equity": float(acct.equity),
             "cash": float(acct.cash),
             "buying_power": float(acct.buying_power),
         }
-        return json.dumps(data, indent=2)
+        return _dumps(data)
     except Exception as e:
         return f"Error getting account: {e}"
 
@@ -212,19 +484,27 @@ async def get_account() -> str:
 @mcp.tool(description="Get all open positions.")
 async def get_positions() -> str:
     try:
-        positions = alpaca.list_positions()
-        data = [
-            {
-                "symbol": p.symbol,
-                "qty": int(p.qty),
-                "current_price": float(p.current_price),
-                "market_value": float(p.market_value),
-                "unrealized_pl": float(p.unrealized_pl),
-                "unrealized_plpc": float(p.unrealized_plpc),
-            }
-            for p in positions
-        ]
-        return json.dumps(data, indent=2)
+        positions = await _list_positions()
+        # Encode one position at a time so peak memory is a single dict plus
+        # the output buffer, not a full list of dicts plus its encoding.
+        buf = bytearray(b"[")
+        for p in positions:
+            buf += orjson.dumps(
+                {
+                    "symbol": p.symbol,
+                    "qty": int(p.qty),
+                    "current_price": float(p.current_price),
+                    "market_value": float(p.market_value),
+                    "unrealized_pl": float(p.unrealized_pl),
+                    "unrealized_plpc": float(p.unrealized_plpc),
+                }
+            )
+            buf += b","
+        if positions:
+            buf[-1:] = b"]"
+        else:
+            buf += b"]"
+        return buf.decode()
     except Exception as e:
         return f"Error getting positions: {e}"
 
@@ -246,12 +526,7 @@ async def place_order(
         )
 
     try:
-        snap = alpaca.get_snapshot(symbol)
-        price = (
-            float(snap.latest_trade.p)
-            if getattr(snap, "latest_trade", None) is not None
-            else None
-        )
+        price = await _latest_price(symbol)
         if not price:
             return "ERROR: Could not fetch latest price"
 
@@ -262,13 +537,15 @@ async def place_order(
                 f"MAX_POSITION_VALUE ${MAX_POSITION_VALUE:,.2f}"
             )
 
-        order = alpaca.submit_order(
+        order = await _run(
+            alpaca.submit_order,
             symbol=symbol,
             qty=qty,
             side=side.lower(),
             type="market",
             time_in_force=time_in_force.lower(),
         )
+        _invalidate_after_write(symbol)
 
         result = {
             "status": "submitted",
@@ -278,7 +555,7 @@ async def place_order(
             "side": order.side,
             "created_at": str(order.created_at),
         }
-        return json.dumps(result, indent=2)
+        return _dumps(result)
     except Exception as e:
         return f"ERROR placing order: {e}"
 
@@ -287,7 +564,8 @@ async def place_order(
 async def close_position(symbol: str) -> str:
     symbol = symbol.upper()
     try:
-        alpaca.close_position(symbol)
+        await _run(alpaca.close_position, symbol)
+        _invalidate_after_write(symbol)
         return f"Closed position in {symbol}."
     except Exception as e:
         return f"Error closing position: {e}"
@@ -297,23 +575,46 @@ async def close_position(symbol: str) -> str:
 async def analyze_portfolio() -> str:
     """Text-only portfolio summary + send analytics to the app."""
     try:
-        positions = alpaca.list_positions()
+        positions = await _list_positions()
         if not positions:
             return "No open positions."
 
-        symbols: List[str] = [p.symbol for p in positions]
-        values = [float(p.market_value) for p in positions]
-        pnl = [float(p.unrealized_pl) for p in positions]
-        pnl_pct = [float(p.unrealized_plpc) * 100 for p in positions]
+        # Single pass: totals, per-position lines and analytics rows together.
+        # Pos rows go straight into the analytics payload (orjson encodes
+        # slotted dataclasses natively).
+        total_value = 0.0
+        total_pnl = 0.0
+        winners = 0
+        losers = 0
+        position_lines: List[str] = []
+        position_rows: List[Pos] = []
+
+        for pos in positions:
+            row = Pos(
+                pos.symbol,
+                float(pos.market_value),
+                float(pos.unrealized_pl),
+                float(pos.unrealized_plpc) * 100,
+            )
+            v = row.market_value
+            p = row.unrealized_pl
+
+            total_value += v
+            total_pnl += p
+            if p > 0:
+                winners += 1
+            elif p < 0:
+                losers += 1
+
+            position_lines.append(
+                f"- {row.symbol}: value=${v:,.2f}, P&L=${p:,.2f} "
+                f"({row.unrealized_plpc:+.2f}%)"
+            )
+            position_rows.append(row)
 
-        total_value = sum(values)
-        total_pnl = sum(pnl)
         invested = total_value - total_pnl
         total_pnl_pct = (total_pnl / invested * 100) if invested > 0 else 0.0
 
-        winners = len([x for x in pnl if x > 0])
-        losers = len([x for x in pnl if x < 0])
-
         lines = [
             "Portfolio summary:",
             "",
@@ -323,11 +624,7 @@ async def analyze_portfolio() -> str:
             "",
             "Per-position:",
         ]
-
-        for sym, v, p, pct in zip(symbols, values, pnl, pnl_pct):
-            lines.append(
-                f"- {sym}: value=${v:,.2f}, P&L=${p:,.2f} ({pct:+.2f}%)"
-            )
+        lines.extend(position_lines)
 
         # --- NEW: send compact analytics payload to your app ---
         analytics_payload = {
@@ -337,24 +634,26 @@ async def analyze_portfolio() -> str:
             "position_count": len(positions),
             "winners": winners,
             "losers": losers,
-            "positions": [
-                {
-                    "symbol": sym,
-                    "market_value": v,
-                    "unrealized_pl": p,
-                    "unrealized_plpc": pct,
-                }
-                for sym, v, p, pct in zip(symbols, values, pnl, pnl_pct)
-            ],
+            "positions": position_rows,
         }
 
-        send_analytics("portfolio_analysis", analytics_payload)
+        send_analytics_in_background("portfolio_analysis", analytics_payload)
 
         return "\n".join(lines)
     except Exception as e:
         return f"Error analyzing portfolio: {e}"
 
 
+# ---------------------------------------------------------------------------
+# ASGI app (HTTP transport)
+# ---------------------------------------------------------------------------
+
+# MCP sessions live in process memory, so with several workers a client's
+# follow-up request may land on a process that never saw its session. Run
+# stateless in that case.
+asgi_app = mcp.http_app(stateless_http=WEB_CONCURRENCY > 1)
+
+
 # ---------------------------------------------------------------------------
 # Entrypoint: stdio vs HTTP
 # ---------------------------------------------------------------------------
@@ -368,8 +667,16 @@ if __name__ == "__main__":
         logger.info(
             f"Starting Alpaca MCP Server (HTTP) on 0.0.0.0:{port}..."
         )
-        mcp.run(
-            transport="http",  # FastMCP HTTP transport
+        import uvicorn
+
+        # Multiple worker processes (one event loop each) on uvloop +
+        # httptools from uvicorn[standard]. Workers import asgi_app fresh.
+        uvicorn.run(
+            "server:asgi_app",
+            app_dir=os.path.dirname(os.path.abspath(__file__)),
+            workers=WEB_CONCURRENCY,
+            loop="uvloop",
+            http="httptools",
             host="0.0.0.0",
             port=port,
         )